@@ -1,14 +1,26 @@
 #!/usr/bin/env python3
 
 
+from functools import lru_cache
+import os
+import sys
+
 import click
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from loader import default_input, load_int_array, open_input  # noqa: E402
+
+
+# bytes of the manifest read at once in streaming mode
+CHUNK_SIZE = 64 * 1024 * 1024
+
 
 def compute_fuel(m):
     fuel = m // 3
     return fuel - 2
 
 
+@lru_cache(maxsize=4096)
 def compute_added_fuel(m):
     add = compute_fuel(m)
     if add <= 0:
@@ -16,13 +28,77 @@ def compute_added_fuel(m):
     return add + compute_added_fuel(add)
 
 
-total_added_fuel = total = 0
-with open('input', 'r') as _f:
-    for module in _f.readlines():
-        fuel = compute_fuel(int(module))
+def read_chunks(path, chunk_size=CHUNK_SIZE):
+    """
+    yields the masses of the manifest as int arrays, reading `chunk_size` bytes at a time: a line cut by the end of a
+    chunk is carried over to the next one.
+    """
+    # numpy is only needed by the streaming mode
+    import numpy as np
+
+    carry = b''
+    with open_input(path) as _f:
+        while True:
+            data = _f.read(chunk_size)
+            if not data:
+                break
+            data = carry + data
+            end = data.rfind(b'\n') + 1
+            carry = data[end:]
+            if end:
+                yield np.fromstring(data[:end], dtype=np.int64, sep='\n')
+    if carry.strip():
+        yield np.fromstring(carry, dtype=np.int64, sep='\n')
+
+
+def compute_chunk_fuel(masses):
+    """
+    returns (fuel, fuel including fuel itself) for a chunk of masses. each distinct mass of the chunk is computed once
+    and weighted by its count, then `m // 3 - 2` is applied to every lane until all of them reach zero.
+    """
+    import numpy as np
+
+    masses, counts = np.unique(masses, return_counts=True)
+    fuel = masses // 3 - 2
+    total = int(fuel @ counts)
+
+    total_added_fuel = total
+    fuel = np.maximum(fuel, 0)
+    while fuel.any():
+        fuel = np.maximum(fuel // 3 - 2, 0)
+        total_added_fuel += int(fuel @ counts)
+    return total, total_added_fuel
+
+
+def stream(path, chunk_size=CHUNK_SIZE):
+    total_added_fuel = total = 0
+    for masses in read_chunks(path, chunk_size):
+        fuel, added_fuel = compute_chunk_fuel(masses)
+        total += fuel
+        total_added_fuel += added_fuel
+    return total, total_added_fuel
+
+
+def compute(path):
+    total_added_fuel = total = 0
+    for module in load_int_array(path):
+        fuel = compute_fuel(module)
         total += fuel
         fuel += compute_added_fuel(fuel)
         total_added_fuel += fuel
+    return total, total_added_fuel
+
+
+@click.command()
+@click.option('--input', 'path', default=default_input(__file__), type=click.Path(exists=True, allow_dash=True),
+              help='manifest of modules masses, - for stdin')
+@click.option('--stream', 'streaming', is_flag=True, help='process the manifest by chunks, vectorized')
+def main(path, streaming):
+    total, total_added_fuel = stream(path) if streaming else compute(path)
+
+    click.secho(f'Total fuel needed: {total}', fg='green')
+    click.secho(f'Total fuel needed, including fuel itself: {total_added_fuel}', fg='green')
+
 
-click.secho(f'Total fuel needed: {total}', fg='green')
-click.secho(f'Total fuel needed, including fuel itself: {total_added_fuel}', fg='green')
+if __name__ == '__main__':
+    main()
@@ -3,12 +3,16 @@
 
 from copy import copy
 import click
+import os
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from loader import default_input, load_int_array  # noqa: E402
+from result_cache import ResultCache  # noqa: E402
 
-def load_program():
-    with open('input', 'r') as program:
-        return [int(e) for e in program.readlines()[0].rstrip().split(',')]
+
+def load_program(path=default_input(__file__)):
+    return list(load_int_array(path))
 
 
 class HaltError(Exception):
@@ -57,10 +61,10 @@ def dump(program, memory):
         click.secho(']', fg='green')
 
 
-program = load_program()
-
+def puzzle(program, noun, verb, cache=None):
+    if cache is not None:
+        return cache.lookup({1: noun, 2: verb}, (), lambda: puzzle(program, noun, verb))
 
-def puzzle(noun, verb):
     memory = copy(program)
     pointer = 0
 
@@ -80,11 +84,22 @@ def puzzle(noun, verb):
     return memory[0]
 
 
+@click.command()
+@click.option('--input', 'path', default=default_input(__file__), type=click.Path(exists=True, allow_dash=True),
+              help='Intcode program, - for stdin')
+@click.option('--cache', is_flag=True, help='cache the runs results in memory and on disk')
+def main(path, cache):
+    program = load_program(path)
+    cache = ResultCache('day2', program) if cache else None
+
+    #print(puzzle(program, noun=12, verb=2))
+    for noun in range(100):
+        for verb in range(100):
+            if puzzle(program, noun, verb, cache) == 19690720:
+                print(f'{noun}, {verb} => {noun*100+verb}')
+                sys.exit(0)
+
 
-#print(puzzle(noun=12, verb=2))
-for noun in range(100):
-    for verb in range(100):
-        if puzzle(noun, verb) == 19690720:
-            print(f'{noun}, {verb} => {noun*100+verb}')
-            sys.exit(0)
+if __name__ == '__main__':
+    main()
 
@@ -1,57 +1,305 @@
 #!/usr/bin/env python3
-from copy import copy
 
+"""
+a wire is kept as a list of axis-aligned segments, each one knowing how many steps were walked to reach its start, so
+the steps to reach any point of a segment is `steps + distance from its start`.
 
-def load_wires():
-    with open('input', 'r') as program:
-        one, two = program.readlines()
-        return one.split(','), two.split(',')
+crossings between an horizontal and a vertical segment are found with a sweep line over x: horizontal segments are
+active between their two ends, and each vertical segment queries the active horizontal segments of the other wire
+whose y is in its own range.
+"""
 
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple
+from itertools import chain, combinations, islice
+from multiprocessing import Pool, cpu_count
+import os
+import sys
 
-def trace_line_from_center(line):
-    p = (0, 0)
-    pts = [p]
+import click
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from loader import default_input, load_moves  # noqa: E402
+
+
+Segment = namedtuple('Segment', ['x0', 'y0', 'x1', 'y1', 'steps'])
+
+MOVES = {
+    'R': (1, 0),
+    'L': (-1, 0),
+    'U': (0, 1),
+    'D': (0, -1),
+}
+
+# sweep events order on the same x: horizontal segments starting there must be active when vertical segments are
+# queried, and horizontal segments ending there must still be
+H_START, V_QUERY, H_END = range(3)
+
+
+def load_wires(path):
+    one, two = load_moves(path)
+    return one, two
+
+
+def load_all_wires(path):
+    return load_moves(path)
+
+
+def trace_segments_from_center(line):
+    x, y = 0, 0
+    steps = 0
+    segments = []
     for move in line:
-        direction = move[0]
+        dx, dy = MOVES[move[0]]
         length = int(move[1:])
-        if direction == 'R':
-            pts.extend([(x, p[1]) for x in range(p[0]+1, p[0]+1 + length, 1)])
-        elif direction == 'L':
-            pts.extend([(x, p[1]) for x in range(p[0]-1, p[0]-1 - length, -1)])
-        elif direction == 'U':
-            pts.extend([(p[0], y) for y in range(p[1]+1, p[1]+1 + length, 1)])
-        elif direction == 'D':
-            pts.extend([(p[0], y) for y in range(p[1]-1, p[1]-1 - length, -1)])
-        p = pts[-1]
+        segments.append(Segment(x, y, x + dx * length, y + dy * length, steps))
+        x, y = x + dx * length, y + dy * length
+        steps += length
+
+    return segments
+
+
+def is_horizontal(segment):
+    return segment.y0 == segment.y1
+
+
+def steps_to(segment, p):
+    return segment.steps + abs(p[0] - segment.x0) + abs(p[1] - segment.y0)
+
+
+def crossings(wire1, wire2):
+    """
+    yields (point, combined steps) for every horizontal/vertical crossing between the two wires
+    """
+    events = []
+    for wire, segments in enumerate((wire1, wire2)):
+        for segment in segments:
+            xmin, xmax = sorted((segment.x0, segment.x1))
+            if is_horizontal(segment):
+                events.append((xmin, H_START, wire, segment))
+                events.append((xmax, H_END, wire, segment))
+            else:
+                events.append((xmin, V_QUERY, wire, segment))
+    events.sort(key=lambda e: (e[0], e[1]))
+
+    # per wire, sorted (y, id) of active horizontal segments
+    active = ([], [])
+    by_id = {}
+    for x, kind, wire, segment in events:
+        key = (segment.y0, id(segment))
+        if kind == H_START:
+            by_id[id(segment)] = segment
+            insort(active[wire], key)
+        elif kind == H_END:
+            del active[wire][bisect_left(active[wire], key)]
+        else:
+            ymin, ymax = sorted((segment.y0, segment.y1))
+            others = active[1 - wire]
+            lo = bisect_left(others, (ymin, ))
+            hi = bisect_right(others, (ymax, float('inf')))
+            for y, other in others[lo:hi]:
+                p = (x, y)
+                yield p, steps_to(segment, p) + steps_to(by_id[other], p)
+
+
+def overlap(segment, other, every_point=False):
+    """
+    yields (point, combined steps) for two collinear segments sharing a stretch: the combined steps and the manhattan
+    distance being piecewise linear along that stretch, only its ends and the axis crossing can be the best, or their
+    neighbours when one of them is (0, 0). with `every_point`, all the points of the stretch are yielded.
+    """
+    horizontal = is_horizontal(segment)
+    a, b = (0, 1) if horizontal else (1, 0)
+    lo1, hi1 = sorted((segment[a], segment[a + 2]))
+    lo2, hi2 = sorted((other[a], other[a + 2]))
+    lo, hi = max(lo1, lo2), min(hi1, hi2)
+    for c in range(lo, hi + 1) if every_point else {lo, lo + 1, hi - 1, hi, -1, 0, 1}:
+        if not lo <= c <= hi:
+            continue
+        p = (c, segment[b]) if horizontal else (segment[b], c)
+        yield p, steps_to(segment, p) + steps_to(other, p)
+
+
+def overlaps(wire1, wire2, every_point=False):
+    """
+    yields (point, combined steps) for collinear segments of both wires sharing a stretch
+    """
+    for horizontal in (True, False):
+        b = 1 if horizontal else 0
+        lines = {}
+        for segment in wire2:
+            if is_horizontal(segment) == horizontal:
+                lines.setdefault(segment[b], []).append(segment)
+
+        for segment in wire1:
+            if is_horizontal(segment) == horizontal:
+                for other in lines.get(segment[b], []):
+                    yield from overlap(segment, other, every_point)
 
-    return pts
+
+def segment_collisions(segment, other):
+    """
+    yields (point, combined steps) for any two segments, whatever their orientation
+    """
+    if is_horizontal(segment) == is_horizontal(other):
+        b = 1 if is_horizontal(segment) else 0
+        if segment[b] == other[b]:
+            yield from overlap(segment, other)
+        return
+
+    horizontal, vertical = (segment, other) if is_horizontal(segment) else (other, segment)
+    p = (vertical.x0, horizontal.y0)
+    if min(horizontal.x0, horizontal.x1) <= p[0] <= max(horizontal.x0, horizontal.x1) and \
+            min(vertical.y0, vertical.y1) <= p[1] <= max(vertical.y0, vertical.y1):
+        yield p, steps_to(segment, p) + steps_to(other, p)
+
+
+def collisions(wire1, wire2):
+    """
+    returns a dict of every collision point => lowest combined steps to reach it, (0, 0) excluded.
+    overlapping stretches are walked point by point, which costs their length: what this reports is listed in full.
+    """
+    combined_steps = {}
+    for p, steps in chain(crossings(wire1, wire2), overlaps(wire1, wire2, every_point=True)):
+        if p != (0, 0) and steps < combined_steps.get(p, float('inf')):
+            combined_steps[p] = steps
+    return combined_steps
 
 
 def manhattan_distance(pa, pb):
     return abs(pb[0] - pa[0]) + abs(pb[1] - pa[1])
 
 
-one, two = load_wires()
-pts1 = trace_line_from_center(one)
-pts2 = trace_line_from_center(two)
-s1 = set(pts1)
-s2 = set(pts2)
-print(f'{len(s1)} points in wire #1')
-print(f'{len(s2)} points in wire #2')
+def cells_of(segment, cell_size):
+    xmin, xmax = sorted((segment.x0, segment.x1))
+    ymin, ymax = sorted((segment.y0, segment.y1))
+    for cx in range(xmin // cell_size, xmax // cell_size + 1):
+        for cy in range(ymin // cell_size, ymax // cell_size + 1):
+            yield cx, cy
+
+
+def build_grid(wires, cell_size):
+    """
+    spatial index of the segments of all wires: cell => [(wire, segment), ...], a segment being registered in every
+    cell its bounding box covers
+    """
+    grid = {}
+    for wire, segments in enumerate(wires):
+        for segment in segments:
+            for cell in cells_of(segment, cell_size):
+                grid.setdefault(cell, []).append((wire, segment))
+    return grid
+
+
+def reference_cell(segment, other, cell_size):
+    """
+    the cell holding the lower-left corner of both segments bounding boxes intersection: a pair of segments sharing
+    several cells is only checked in that one
+    """
+    x = max(min(segment.x0, segment.x1), min(other.x0, other.x1))
+    y = max(min(segment.y0, segment.y1), min(other.y0, other.y1))
+    return x // cell_size, y // cell_size
+
+
+def grid_collisions(job):
+    """
+    for a chunk of grid cells, returns a dict of wire pair => (closest manhattan distance, lowest combined steps)
+    """
+    cells, cell_size = job
+    best = {}
+    for cell, entries in cells:
+        for (w1, s1), (w2, s2) in combinations(entries, 2):
+            if w1 == w2 or reference_cell(s1, s2, cell_size) != cell:
+                continue
+            pair = (w1, w2) if w1 < w2 else (w2, w1)
+            for p, steps in segment_collisions(s1, s2):
+                if p == (0, 0):
+                    continue
+                distance = manhattan_distance((0, 0), p)
+                d, s = best.get(pair, (distance, steps))
+                best[pair] = min(d, distance), min(s, steps)
+    return best
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def many_wires_collisions(wires, cell_size=None, jobs=None):
+    """
+    returns a dict of wire pair => (closest manhattan distance, lowest combined steps), for every pair of wires that
+    cross. grid cells are spread across a pool of processes.
+    """
+    segments = [segment for wire in wires for segment in wire]
+    if cell_size is None:
+        # a third of the mean segment length keeps both the cells per segment and the segments per cell low
+        cell_size = max(1, sum(abs(s.x1 - s.x0) + abs(s.y1 - s.y0) for s in segments) // max(1, 3 * len(segments)))
+
+    grid = build_grid(wires, cell_size)
+    jobs = jobs or cpu_count()
+    chunk_size = max(1, len(grid) // (jobs * 4))
+
+    best = {}
+    with Pool(processes=jobs) as pool:
+        tasks = ((cells, cell_size) for cells in chunks(grid.items(), chunk_size))
+        for result in pool.imap_unordered(grid_collisions, tasks):
+            for pair, (distance, steps) in result.items():
+                d, s = best.get(pair, (distance, steps))
+                best[pair] = min(d, distance), min(s, steps)
+    return best
+
+
+def many(path, cell_size, jobs):
+    wires = [trace_segments_from_center(line) for line in load_all_wires(path)]
+    print(f'{len(wires)} wires, {sum(len(wire) for wire in wires)} segments')
+
+    best = many_wires_collisions(wires, cell_size, jobs)
+    for (w1, w2), (distance, steps) in sorted(best.items()):
+        print(f'#{w1 + 1} x #{w2 + 1}: closest at {distance}, lowest combined steps {steps}')
+
+    if best:
+        print('Closest collision: ')
+        print(min(distance for distance, _ in best.values()))
+        print('Lowest combined distance: ')
+        print(min(steps for _, steps in best.values()))
+
+
+@click.command()
+@click.option('--input', 'path', default=default_input(__file__), type=click.Path(exists=True, allow_dash=True),
+              help='file of wires, one per line, - for stdin')
+@click.option('--many', 'many_wires', is_flag=True, help='cross every pair of wires of the input, not only two')
+@click.option('--cell', 'cell_size', type=int, default=None,
+              help='grid cell size (default: a third of the mean segment length)')
+@click.option('--jobs', type=int, default=None, help='number of worker processes (default: one per CPU)')
+def main(path, many_wires, cell_size, jobs):
+    if many_wires:
+        many(path, cell_size, jobs)
+        return
+
+    one, two = load_wires(path)
+    wire1 = trace_segments_from_center(one)
+    wire2 = trace_segments_from_center(two)
+    print(f'{len(wire1)} segments in wire #1')
+    print(f'{len(wire2)} segments in wire #2')
+
+    combined_steps = collisions(wire1, wire2)
+    print(f'{len(combined_steps)} collisions between #1 and #2, minus (0, 0): ')
+    print(set(combined_steps))
 
-collisions = s1.intersection(s2) - {(0, 0)}
-print(f'{len(collisions)} collisions between #1 and #2, minus (0, 0): ')
-print(collisions)
+    distances = [manhattan_distance((0, 0), p) for p in combined_steps]
+    print(f'manhattan distances for all these collisions, sorted: ')
+    print(sorted(distances))
 
-distances = [manhattan_distance((0, 0), p) for p in collisions]
-print(f'manhattan distances for all these collisions, sorted: ')
-print(sorted(distances))
+    print(f'Combined steps to reach these collisions: ')
+    print(combined_steps)
+    print('Lowest combined distance: ')
+    print(min(combined_steps.values()))
 
-combined_steps = {}
-for p in collisions:
-    combined_steps[p] = pts1.index(p) + pts2.index(p)
 
-print(f'Combined steps to reach these collisions: ')
-print(combined_steps)
-print('Lowest combined distance: ')
-print(min(combined_steps.values()))
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,124 @@
 #!/usr/bin/env python3
 
-from itertools import groupby
+"""
+passwords are counted with a dynamic programming over digits, not by enumerating the range.
 
-candidates = []
+going through the digits of a password from left to right, a rule only needs a small state: the previous digit, the
+length of the current run of that digit (capped, a run longer than 2 is as good as 3), and whether a finished run
+already made a double / an exact pair. so the number of passwords of a given length that can follow a state only
+depends on (remaining digits, state), and is memoized.
+"""
 
-# cond. 1-2
-for n in range(136818, 685979+1):
-    s = str(n)
+from collections import namedtuple
+from functools import lru_cache
 
-    # cond. 3&5: 2 and only 2 adjacent digits are the same
-    groups = [digit for digit, group in groupby(s) if len(list(group)) == 2]
-    if len(groups) == 0:
-        continue
+import click
 
-    # cond. 4: increasing digits
-    if ''.join(sorted(s)) != s:
-        continue
 
-    candidates.append(n)
+Rule = namedtuple('Rule', ['step', 'accept'])
 
+# (previous digit, current run length, has a double, has an exact pair)
+START = (None, 0, False, False)
 
-print(len(candidates))
+
+def increasing_step(state, digit):
+    """
+    cond. 4: digits never decrease. returns None if `digit` can't follow `state`.
+    """
+    prev, run, has_double, has_pair = state
+    if prev is not None and digit < prev:
+        return None
+    if digit == prev:
+        return digit, min(run + 1, 3), has_double, has_pair
+    return digit, 1, has_double or run >= 2, has_pair or run == 2
+
+
+# cond. 3: 2 adjacent digits are the same
+PART1 = Rule(increasing_step, lambda state: state[2] or state[1] >= 2)
+
+# cond. 3&5: 2 and only 2 adjacent digits are the same
+PART2 = Rule(increasing_step, lambda state: state[3] or state[1] == 2)
+
+
+@lru_cache(maxsize=None)
+def completions(rule, remaining, state):
+    """
+    number of ways to end a password in `remaining` free digits from `state`
+    """
+    if remaining == 0:
+        return 1 if rule.accept(state) else 0
+
+    total = 0
+    for digit in range(10):
+        following = rule.step(state, digit)
+        if following is not None:
+            total += completions(rule, remaining - 1, following)
+    return total
+
+
+def bounded(rule, low, high, pos, state, tight_low, tight_high, prefix, stream):
+    """
+    walks the passwords between the digit strings `low` and `high`, of the same length. as soon as both bounds are
+    left behind, the count comes from `completions`; when streaming, subtrees with no completion are pruned.
+    """
+    remaining = len(high) - pos
+    if not tight_low and not tight_high and not stream:
+        yield completions(rule, remaining, state)
+        return
+    if remaining == 0:
+        if rule.accept(state):
+            yield prefix if stream else 1
+        return
+
+    lo = int(low[pos]) if tight_low else 0
+    hi = int(high[pos]) if tight_high else 9
+    for digit in range(lo, hi + 1):
+        following = rule.step(state, digit)
+        if following is None or completions(rule, remaining - 1, following) == 0:
+            continue
+        yield from bounded(rule, low, high, pos + 1, following, tight_low and digit == lo,
+                           tight_high and digit == hi, prefix * 10 + digit, stream)
+
+
+def ranges_by_length(lo, hi):
+    for length in range(len(str(lo)), len(str(hi)) + 1):
+        low = max(lo, 10 ** (length - 1) if length > 1 else 0)
+        high = min(hi, 10 ** length - 1)
+        yield str(low), str(high)
+
+
+def count(lo, hi, rule=PART2):
+    """
+    number of passwords in [lo, hi] following `rule`
+    """
+    return sum(
+        n for low, high in ranges_by_length(lo, hi)
+        for n in bounded(rule, low, high, 0, START, True, True, 0, False)
+    )
+
+
+def matches(lo, hi, rule=PART2):
+    """
+    lazily yields the passwords in [lo, hi] following `rule`, in increasing order
+    """
+    for low, high in ranges_by_length(lo, hi):
+        yield from bounded(rule, low, high, 0, START, True, True, 0, True)
+
+
+@click.command()
+@click.option('--lo', default=136818, help='lower bound of the range (cond. 2)')
+@click.option('--hi', default=685979, help='upper bound of the range (cond. 2)')
+@click.option('--part', type=click.Choice(['1', '2']), default='2', help='rules to follow')
+@click.option('--list', 'list_matches', is_flag=True, help='print the passwords themselves')
+def main(lo, hi, part, list_matches):
+    rule = PART1 if part == '1' else PART2
+    if list_matches:
+        for password in matches(lo, hi, rule):
+            print(password)
+        return
+
+    print(count(lo, hi, rule))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,12 +2,17 @@
 
 from enum import Enum
 from copy import copy
+import os
+import sys
+
 import click
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from loader import default_input, load_int_array  # noqa: E402
+
 
-def load_program():
-    with open('input', 'r') as program:
-        return [int(e) for e in program.readlines()[0].rstrip().split(',')]
+def load_program(path=default_input(__file__)):
+    return list(load_int_array(path))
 
 
 class HaltError(Exception):
@@ -175,7 +180,7 @@ def run(program):
     return memory[0]
 
 
-TEST = lambda: run(load_program())
+TEST = lambda path=default_input(__file__): run(load_program(path))
 
 echo_stdin = lambda: run([3, 0, 4, 0, 99])
 
@@ -187,4 +192,14 @@ less_equal_or_greater_than_8 = lambda: run([
     20, 1105, 1, 46, 104, 999, 1105, 1, 46, 1101, 1000, 1, 20, 4, 20, 1105, 1, 46, 98, 99
 ])
 
-TEST()
+
+# no stdin here: the program prompts for its input on it
+@click.command()
+@click.option('--input', 'path', default=default_input(__file__), type=click.Path(exists=True, dir_okay=False),
+              help='Intcode program')
+def main(path):
+    TEST(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -32,11 +32,17 @@ total = 42
 => il suffit de sommer l'ecart de chaque sommet avec la racine, soit la profondeur de chaque sommet
 """
 
+import os
+import sys
 
-def load_orbits():
-    with open('input', 'r') as orbits:
-        for o in orbits.readlines():
-            yield o.rstrip().split(')')
+import click
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from loader import default_input, load_edge_list  # noqa: E402
+
+
+def load_orbits(path=default_input(__file__)):
+    return load_edge_list(path)
 
 
 def tree_count(root, depth, children):
@@ -52,7 +58,10 @@ def all_parents(v, parents):
     return res
 
 
-def main():
+@click.command()
+@click.option('--input', 'path', default=default_input(__file__), type=click.Path(exists=True, allow_dash=True),
+              help='orbits map, - for stdin')
+def main(path):
     children = {}
     parents = {}
     # for (a, b) in [
@@ -70,7 +79,7 @@ def main():
     #     ('K', 'YOU'),
     #     ('I', 'SAN'),
     # ]:
-    for (a, b) in load_orbits():
+    for (a, b) in load_orbits(path):
         if a in children:
             children[a].append(b)
         else:
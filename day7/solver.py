@@ -1,16 +1,22 @@
 #!/usr/bin/env python3
 
+from collections import deque
 from enum import Enum
-from copy import copy
 from itertools import permutations
-from multiprocessing import Process, Pipe
+from multiprocessing import Pool
+import os
+import sys
 
 import click
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from loader import default_input, load_int_array  # noqa: E402
+from program_image import Overlay, publish  # noqa: E402
+from result_cache import ResultCache  # noqa: E402
 
-def load_program():
-    with open('input', 'r') as program:
-        return [int(e) for e in program.readlines()[0].rstrip().split(',')]
+
+def load_program(path=default_input(__file__)):
+    return list(load_int_array(path))
 
 
 class HaltError(Exception):
@@ -25,6 +31,14 @@ class UnknownModeError(Exception):
     pass
 
 
+class BlockedError(Exception):
+    pass
+
+
+class DeadlockError(Exception):
+    pass
+
+
 class OPCode(Enum):
     ADD = 1    # addition
     MUL = 2    # multiplication
@@ -140,13 +154,40 @@ def run_instruction(ctx, pointer):
     return pointer
 
 
-def run(program, stdin, stdout):
-    ctx = dict(memory=copy(program), stdin=stdin, stdout=stdout)
-    pointer = 0
+class Channel:
+    """
+    in-process pipe end: recv raises BlockedError instead of waiting when nothing was sent yet
+    """
+
+    def __init__(self):
+        self.values = deque()
+
+    def send(self, value):
+        self.values.append(value)
+
+    def recv(self):
+        if not self.values:
+            raise BlockedError
+        return self.values.popleft()
+
+
+def boot(program, stdin, stdout):
+    return dict(memory=Overlay(program), stdin=stdin, stdout=stdout, pointer=0, halted=False)
+
+
+def resume(ctx):
+    """
+    runs until the program halts or waits for an input not there yet, in which case the IN instruction is run again by
+    the next resume. returns whether the program halted.
+    """
+    pointer = ctx['pointer']
 
     try:
         while True:
             pointer = run_instruction(ctx, pointer)
+    except BlockedError:
+        ctx['pointer'] = pointer
+        return False
     except HaltError:
         # no-op
         pass
@@ -155,49 +196,91 @@ def run(program, stdin, stdout):
     except UnknownModeError:
         click.secho(f'Unknown mode: {ctx["memory"][pointer]} at position {pointer}:', fg='red')
 
+    ctx['pointer'] = pointer
+    ctx['halted'] = True
+    return True
+
+
+def get_thrusters_power(acs, phase_seq, cache=None):
+    if cache is not None:
+        return cache.lookup({}, phase_seq, lambda: get_thrusters_power(acs, phase_seq))
 
-def get_thrusters_power(phase_seq):
     seq_len = len(phase_seq)
-    acs = load_program()
     # acs = [3,26,1001,26,-4,26,3,27,1002,27,2,27,1,27,26,27,4,27,1001,28,-1,28,1005,28,6,99,0,0,5]
     # acs = [3,52,1001,52,-5,52,3,53,1,52,56,54,1007,54,5,55,1005,55,26,1001,54,-5,54,1105,1,12,1,53,54,53,1008,54,0,55,1001,55,1,55,2,53,55,53,4,53,1001,56,-1,56,1005,56,6,99,0,0,0,0,10]
 
-    # create crossed pipes from one process to previous
-    stdios = {phase: ['stdin', 'stdout'] for phase in phase_seq}
+    # amplifier i reads from channel i and writes to channel i+1, the last one writing back to the first one
+    channels = [Channel() for _ in range(seq_len)]
+    amplifiers = [boot(acs, channels[i], channels[(i + 1) % seq_len]) for i in range(seq_len)]
+
+    # send phase of each amplifier, then initial signal to the first one
     for i in range(seq_len):
-        stdios[phase_seq[i]][0], stdios[phase_seq[i-1]][1] = Pipe()
+        channels[i].send(phase_seq[i])
+    channels[0].send(0)
 
-    processes = {}
-    for phase in phase_seq:
-        processes[phase] = Process(target=run, args=(acs, stdios[phase][0], stdios[phase][1]))
-        processes[phase].start()
+    # feedback loop: amplifiers take turns until the last one is halted
+    while not amplifiers[-1]['halted']:
+        progress = False
+        for amplifier in amplifiers:
+            if amplifier['halted']:
+                continue
+            pointer = amplifier['pointer']
+            resume(amplifier)
+            progress = progress or amplifier['halted'] or amplifier['pointer'] != pointer
+        if not progress:
+            raise DeadlockError(f'all amplifiers are waiting for an input with phases {phase_seq}')
 
-    # send phase of each process to stdout of previous process
-    for i in range(seq_len):
-        stdios[phase_seq[i-1]][1].send(phase_seq[i])
+    # read last output of the last amplifier
+    return channels[0].recv()
 
-    # send initial signal to stdout of last process
-    stdios[phase_seq[-1]][1].send(0)
 
-    # feedback loop
-    while True:
-        # check if last process is halted
-        processes[phase_seq[-1]].join(timeout=1)
-        if processes[phase_seq[-1]].exitcode is not None:
-            break
+# program image of a pool worker, loaded once by init_worker and reset for every permutation by boot
+worker_acs = None
 
-    # read last outpout from stdin of first process
-    return stdios[phase_seq[0]][0].recv()
 
+def init_worker(acs):
+    global worker_acs
+    worker_acs = acs
 
-def main():
+
+def evaluate(phase_seq):
+    return phase_seq, get_thrusters_power(worker_acs, phase_seq)
+
+
+@click.command()
+@click.option('--input', 'path', default=default_input(__file__), type=click.Path(exists=True, allow_dash=True),
+              help='amplifier controller software, - for stdin')
+@click.option('--cache', is_flag=True, help='cache the runs results in memory and on disk')
+@click.option('--phases', default='5,6,7,8,9', help='phase settings to permute')
+@click.option('--jobs', type=int, default=None, help='number of worker processes (default: one per CPU)')
+def main(path, cache, phases, jobs):
     max_power = 0
+    acs = publish(load_program(path))
+    cache = ResultCache('day7-feedback-loop', acs) if cache else None
 
-    for phase_seq in permutations([5, 6, 7, 8, 9]):
-        power = get_thrusters_power(phase_seq)
+    def pivot(power):
+        nonlocal max_power
         if power > max_power:
             click.secho(f'{power} is greater than {max_power}, pivoting.', fg='green')
             max_power = power
+
+    # permutations already known by the cache don't go to the pool
+    todo = []
+    for phase_seq in permutations(int(phase) for phase in phases.split(',')):
+        found, power = cache.get({}, phase_seq) if cache is not None else (False, None)
+        if found:
+            pivot(power)
+        else:
+            todo.append(phase_seq)
+
+    # long-lived workers, sharing the program image, evaluate the other ones as results arrive; none are started when
+    # the cache knew them all
+    if todo:
+        with Pool(processes=jobs, initializer=init_worker, initargs=(acs, )) as pool:
+            for phase_seq, power in pool.imap_unordered(evaluate, todo, chunksize=max(1, len(todo) // 64)):
+                if cache is not None:
+                    cache.put({}, phase_seq, power)
+                pivot(power)
     click.secho(f'Max power = {max_power}', fg='magenta')
 
 
@@ -1,11 +1,25 @@
 #!/usr/bin/env python3
 
+from collections import Counter
 from copy import copy
+from fnmatch import fnmatch
+from multiprocessing import Pool
+import json
+import os
+import sys
 
+import click
 
-def load_passwd_sif():
-    with open('input', 'r') as sif:
-        return sif.readlines()[0].rstrip()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from loader import default_input, load_digit_buffer  # noqa: E402
+
+
+class InvalidImageError(Exception):
+    pass
+
+
+def load_passwd_sif(path, cache=True):
+    return load_digit_buffer(path, cache)
 
 
 def get_layers(sif, width, height):
@@ -41,10 +55,97 @@ def merge_down_layers(layers, width, height):
     return visible
 
 
-def main():
-    passwd_sif = load_passwd_sif()
-    width = 25
-    height = 6
+def decode_sif(job):
+    """
+    decodes one image of a batch: digits histogram of each layer, checksum of the layer with the fewest zeros and the
+    composited image, as rows of digits.
+    """
+    path, width, height = job
+    if width is None:
+        raise InvalidImageError('missing dimensions, expected `path width height`')
+    if width <= 0 or height <= 0:
+        raise InvalidImageError(f'invalid dimensions {width}x{height}')
+    # each image of a batch is read once: parsing it is cheaper than caching it
+    sif = load_passwd_sif(path, cache=False)
+    if not sif:
+        raise InvalidImageError('empty image')
+    if not sif.isdigit():
+        raise InvalidImageError('not an image of digits')
+    if len(sif) % (width * height):
+        raise InvalidImageError(f'{len(sif)} digits is not a whole number of {width}x{height} layers')
+    layers = list(get_layers(sif, width, height))
+
+    histograms = [dict(sorted(Counter(layer).items())) for layer in layers]
+    n0s = [histogram.get('0', 0) for histogram in histograms]
+    fewest_zeros = histograms[n0s.index(min(n0s))]
+
+    visible_layer = merge_down_layers(layers, width, height)
+    return {
+        'path': path,
+        'width': width,
+        'height': height,
+        'histograms': histograms,
+        'checksum': fewest_zeros.get('1', 0) * fewest_zeros.get('2', 0),
+        'image': [visible_layer[offset:offset+width] for offset in range(0, width*height, width)],
+    }
+
+
+def decode_or_report(job):
+    """
+    an image in error doesn't stop the batch, it is reported as such
+    """
+    try:
+        return decode_sif(job)
+    except (InvalidImageError, OSError, UnicodeDecodeError) as e:
+        return {'path': job[0], 'error': str(e)}
+
+
+def load_batch(batch, width, height, pattern='*'):
+    """
+    a batch is either a directory, its files matching `pattern` being images of the given dimensions, or a manifest
+    whose lines are `path width height`, paths being relative to the manifest itself. hidden files are skipped, and a
+    malformed manifest line yields its path with no dimensions.
+    """
+    if os.path.isdir(batch):
+        for name in sorted(os.listdir(batch)):
+            path = os.path.join(batch, name)
+            if not name.startswith('.') and fnmatch(name, pattern) and os.path.isfile(path):
+                yield path, width, height
+        return
+
+    root = os.path.dirname(batch)
+    with open(batch, 'r') as manifest:
+        for line in manifest:
+            if not line.strip() or line.startswith('#'):
+                continue
+            fields = line.split()
+            try:
+                path, w, h = fields
+                yield os.path.join(root, path), int(w), int(h)
+            except ValueError:
+                yield os.path.join(root, fields[0]), None, None
+
+
+def run_batch(batch, width, height, jobs, pattern='*'):
+    with Pool(processes=jobs) as pool:
+        for result in pool.imap_unordered(decode_or_report, load_batch(batch, width, height, pattern)):
+            click.echo(json.dumps(result))
+
+
+@click.command()
+@click.option('--input', 'path', default=default_input(__file__), type=click.Path(exists=True, allow_dash=True),
+              help='image to decode, - for stdin')
+@click.option('--batch', type=click.Path(exists=True), help='directory or manifest of images to decode as JSON lines')
+@click.option('--width', default=25, help='width of the images')
+@click.option('--height', default=6, help='height of the images')
+@click.option('--glob', 'pattern', default='*', help='files of a batch directory to decode')
+@click.option('--jobs', type=int, default=None, help='number of worker processes (default: one per CPU)')
+def main(path, batch, width, height, pattern, jobs):
+    if batch is not None:
+        run_batch(batch, width, height, jobs, pattern)
+        return
+
+    passwd_sif = load_passwd_sif(path)
 
     # passwd_sif = '0222112222120000'
     # width = 2
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+
+"""
+static analysis of an Intcode program: which cells are code, which are data, and which are code that may be written
+to while the program runs.
+
+the analysis walks the instructions reachable from address 0, following the static successors of each one: an
+instruction runs with its static value at least once before any write to it lands, so code stays code even when it is
+modified later. jump targets are followed when they are:
+- immediate,
+- in position mode, the static value of the cell holding them.
+
+writes through a position-mode parameter have a static address: the code cells they reach are self-modified. writes
+through a relative-mode parameter don't, they are reported as dynamic writes and flagged as unbounded: such a write may
+reach any cell, so the map is incomplete, but the cells it is computed from are left as they are.
+
+jumps whose target is a relative one, or may have been modified, as well as instructions whose opcode is written, are
+reported as unresolved: when there are some, code may be reached that the walk never saw, and the map is incomplete.
+"""
+
+import json
+import os
+import sys
+
+import click
+
+from solver import OPCode, OPMode, load_program, parse_mode
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from loader import default_input  # noqa: E402
+
+
+CODE = 'code'
+DATA = 'data'
+SELF_MODIFIED = 'self-modified'
+
+# number of parameters of each instruction
+PARAMETERS = {
+    OPCode.ADD: 3,
+    OPCode.MUL: 3,
+    OPCode.IN: 1,
+    OPCode.OUT: 1,
+    OPCode.JIT: 2,
+    OPCode.JIF: 2,
+    OPCode.LT: 3,
+    OPCode.EQ: 3,
+    OPCode.ARB: 1,
+    OPCode.HALT: 0,
+}
+
+# which parameter of an instruction is an address it writes to
+WRITES = {
+    OPCode.ADD: 3,
+    OPCode.MUL: 3,
+    OPCode.IN: 1,
+    OPCode.LT: 3,
+    OPCode.EQ: 3,
+}
+
+
+def decode(program, pointer):
+    """
+    returns (opcode, [(mode, value), ...]) for the instruction at `pointer`, None if it isn't one
+    """
+    if not 0 <= pointer < len(program):
+        return None
+    try:
+        opcode = OPCode(program[pointer] % 100)
+        n = PARAMETERS[opcode]
+        if pointer + n >= len(program):
+            return None
+        return opcode, [(parse_mode(program[pointer], i), program[pointer + i]) for i in range(1, n + 1)]
+    except ValueError:
+        return None
+
+
+def successors(opcode, parameters, pointer, program, written, anywhere):
+    """
+    returns (static successors, whether the instruction may go elsewhere).
+    the static successors are those of the first run of the instruction. the cells in `written` may hold something
+    else by a later run: an instruction whose opcode is written may go anywhere, and so may a jump whose target, or the
+    cell holding it, is written. when `anywhere` may be written, no position target is certain.
+    """
+    following = pointer + 1 + len(parameters)
+    unresolved = pointer in written
+    if opcode is OPCode.HALT:
+        return [], unresolved
+    if opcode not in (OPCode.JIT, OPCode.JIF):
+        return [following], unresolved
+
+    (cond_mode, cond), (target_mode, target) = parameters
+    if target_mode is OPMode.IMM:
+        targets = [target]
+        unresolved = unresolved or pointer + 2 in written
+    elif target_mode is OPMode.POS and 0 <= target < len(program):
+        targets = [program[target]]
+        unresolved = unresolved or pointer + 2 in written or target in written or anywhere
+    else:
+        targets = []
+        unresolved = True
+
+    # an immediate condition makes the jump either unconditional or never taken
+    if cond_mode is OPMode.IMM and pointer + 1 not in written:
+        if (cond != 0) == (opcode is OPCode.JIT):
+            return targets, unresolved
+        return [following], pointer in written
+    return targets + [following], unresolved
+
+
+def walk(program, written, anywhere):
+    """
+    one walk of the reachable instructions, given the cells known to be written and whether any cell may be.
+    returns (instructions: pointer => (opcode, parameters, successors), unresolved jumps, invalid pointers)
+    """
+    instructions = {}
+    unresolved = set()
+    invalid = set()
+    todo = [0]
+    while todo:
+        pointer = todo.pop()
+        if pointer in instructions or pointer in invalid:
+            continue
+        decoded = decode(program, pointer)
+        if decoded is None:
+            invalid.add(pointer)
+            continue
+        opcode, parameters = decoded
+        following, is_unresolved = successors(opcode, parameters, pointer, program, written, anywhere)
+        if is_unresolved:
+            unresolved.add(pointer)
+        instructions[pointer] = opcode, parameters, following
+        todo.extend(following)
+    return instructions, unresolved, invalid
+
+
+def static_writes(instructions):
+    """
+    returns (cells written through position-mode parameters, pointers of relative-mode writes)
+    """
+    written = set()
+    dynamic = set()
+    for pointer, (opcode, parameters, _) in instructions.items():
+        if opcode not in WRITES:
+            continue
+        mode, value = parameters[WRITES[opcode] - 1]
+        if mode is OPMode.REL:
+            dynamic.add(pointer)
+        else:
+            written.add(value)
+    return written, dynamic
+
+
+def analyze(program):
+    """
+    returns the analysis of `program` as a dict:
+    - cells: one of CODE, DATA, SELF_MODIFIED per cell,
+    - cfg: basic block start => {'end', 'successors'},
+    - dynamic_writes, unresolved_jumps, invalid: instruction pointers,
+    - unbounded_writes: whether a dynamic write may reach any cell, code included,
+    - complete: whether the code map covers all the code the program can run.
+    """
+    # a jump whose condition is written may go both ways, and the written cells depend on the reachable code: iterate
+    # until the set of written cells, and whether there are dynamic writes, is stable (both only grow, the program
+    # being finite)
+    written = set()
+    anywhere = False
+    while True:
+        instructions, unresolved, invalid = walk(program, written, anywhere)
+        now_written, dynamic = static_writes(instructions)
+        if now_written <= written and bool(dynamic) <= anywhere:
+            break
+        written |= now_written
+        anywhere = anywhere or bool(dynamic)
+
+    code = set()
+    for pointer, (opcode, parameters, _) in instructions.items():
+        code.update(range(pointer, pointer + 1 + len(parameters)))
+    # an invalid instruction which is written may well be valid by the time it runs
+    code |= invalid & written
+    cells = [
+        (SELF_MODIFIED if a in written else CODE) if a in code else DATA
+        for a in range(len(program))
+    ]
+
+    return {
+        'cells': cells,
+        'cfg': basic_blocks(instructions),
+        'dynamic_writes': sorted(dynamic),
+        'unresolved_jumps': sorted(unresolved),
+        'invalid': sorted(invalid),
+        'unbounded_writes': anywhere,
+        'complete': not (unresolved or invalid or dynamic or SELF_MODIFIED in cells),
+    }
+
+
+def basic_blocks(instructions):
+    leaders = {0}
+    for pointer, (opcode, parameters, following) in instructions.items():
+        if opcode in (OPCode.JIT, OPCode.JIF, OPCode.HALT):
+            leaders.update(following)
+            leaders.add(pointer + 1 + len(parameters))
+    leaders &= set(instructions)
+
+    blocks = {}
+    for leader in sorted(leaders):
+        pointer = leader
+        while True:
+            opcode, parameters, following = instructions[pointer]
+            if len(following) != 1 or following[0] in leaders or following[0] not in instructions:
+                blocks[leader] = {'end': pointer, 'successors': sorted(following)}
+                break
+            pointer = following[0]
+    return blocks
+
+
+def to_dot(analysis):
+    lines = ['digraph cfg {']
+    for start, block in analysis['cfg'].items():
+        label = f'{start}..{block["end"]}'
+        if block['end'] in analysis['unresolved_jumps']:
+            label += ' (indirect)'
+        lines.append(f'    b{start} [label="{label}"];')
+        for successor in block['successors']:
+            lines.append(f'    b{start} -> b{successor};')
+    lines.append('}')
+    return '\n'.join(lines)
+
+
+@click.command()
+@click.option('--input', 'path', default=default_input(__file__), type=click.Path(exists=True, allow_dash=True),
+              help='Intcode program, - for stdin')
+@click.option('--format', 'output_format', type=click.Choice(['summary', 'json', 'dot']), default='summary')
+def main(path, output_format):
+    analysis = analyze(load_program(path))
+    if output_format == 'json':
+        click.echo(json.dumps(analysis))
+        return
+    if output_format == 'dot':
+        click.echo(to_dot(analysis))
+        return
+
+    cells = analysis['cells']
+    for kind in (CODE, DATA, SELF_MODIFIED):
+        click.secho(f'{kind}: {cells.count(kind)} cells', fg='green')
+    click.secho(f'basic blocks: {len(analysis["cfg"])}', fg='green')
+    click.secho(f'self-modified cells: {[a for a, kind in enumerate(cells) if kind == SELF_MODIFIED]}', fg='yellow')
+    click.secho(f'dynamic writes at: {analysis["dynamic_writes"]}', fg='yellow')
+    click.secho(f'unbounded writes: {analysis["unbounded_writes"]}', fg='yellow')
+    click.secho(f'unresolved jumps at: {analysis["unresolved_jumps"]}', fg='yellow')
+    click.secho(f'invalid instructions at: {analysis["invalid"]}', fg='yellow')
+    click.secho(f'complete: {analysis["complete"]}', fg='magenta' if analysis['complete'] else 'red')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,14 +3,18 @@
 
 from enum import Enum
 from multiprocessing import Process, Pipe
+import os
 import sys
 
 import click
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from loader import default_input, load_int_array  # noqa: E402
+from program_image import Overlay, publish  # noqa: E402
 
-def load_program():
-    with open('input', 'r') as program:
-        return [int(e) for e in program.readlines()[0].rstrip().split(',')]
+
+def load_program(path=default_input(__file__)):
+    return list(load_int_array(path))
 
 
 class HaltError(Exception):
@@ -157,18 +161,185 @@ def run_instruction(ctx, pointer):
     return pointer
 
 
-def run(program, stdin, stdout):
+# loop acceleration.
+#
+# a counting loop is a straight-line body, from the target of a backward jump to that jump, where:
+# - every ADD increments a cell by a loop invariant (an immediate, or a cell the body doesn't write): an induction cell,
+# - at most one LT/EQ compares induction cells and invariants, into a flag only read by the jump,
+# - the jump condition is that flag, or an induction cell, and its target is invariant,
+# - there is no I/O, no ARB, and no write to the body itself.
+#
+# the difference compared by the jump (or the induction cell it tests) is then linear in the iteration number. two
+# iterations are run by the interpreter to measure it, the exit iteration is solved in closed form, and the induction
+# cells are moved straight to their values at the start of that last iteration, which the interpreter runs as usual.
+# anything not matching the pattern, or a loop that never exits, is simply interpreted.
+
+
+def operand(ctx, pointer, n):
+    """
+    returns ('imm', value) or ('cell', address) for the n-th parameter of the instruction at `pointer`
+    """
+    mode = parse_mode(ctx['memory'][pointer], n)
+    value = ctx['memory'][pointer + n]
+    if mode is OPMode.IMM:
+        return 'imm', value
+    if mode is OPMode.REL:
+        return 'cell', value + ctx['rel_base']
+    return 'cell', value
+
+
+def loop_plan(ctx, target, jump):
+    """
+    returns the plan to accelerate the loop from `target` to the jump at `jump`, None if it isn't a counting loop
+    """
+    body = []
+    pointer = target
+    try:
+        while pointer < jump:
+            opcode = parse_opcode(ctx, pointer)
+            if opcode not in (OPCode.ADD, OPCode.LT, OPCode.EQ):
+                return None
+            body.append((pointer, opcode, [operand(ctx, pointer, n) for n in (1, 2, 3)]))
+            pointer += 4
+        if pointer != jump or parse_opcode(ctx, jump) not in (OPCode.JIT, OPCode.JIF):
+            return None
+        condition, destination = operand(ctx, jump, 1), operand(ctx, jump, 2)
+    except (ValueError, UnknownModeError):
+        return None
+
+    written = {params[2] for _, _, params in body}
+    if len(written) != len(body) or any(kind != 'cell' for kind, _ in written):
+        return None
+    if any(target <= address < jump + 3 for _, address in written) or destination in written:
+        return None
+
+    inductions = set()
+    compare = None
+    for pointer, opcode, (p1, p2, out) in body:
+        if opcode is OPCode.ADD:
+            if p1 == out and p2 not in written or p2 == out and p1 not in written:
+                inductions.add(out)
+                continue
+            return None
+        if compare is not None:
+            return None
+        compare = pointer, opcode, out
+
+    if compare is None:
+        if condition not in inductions:
+            return None
+        return {'probe': jump, 'kind': 'direct', 'inductions': inductions}
+
+    pointer, opcode, flag = compare
+    flag_readers = [params for _, _, params in body if flag in params[:2]]
+    if condition != flag or flag_readers:
+        return None
+    _, _, (p1, p2, _) = next(instruction for instruction in body if instruction[0] == pointer)
+    if any(p in written and p not in inductions for p in (p1, p2)):
+        return None
+    return {'probe': pointer, 'kind': 'lt' if opcode is OPCode.LT else 'eq', 'inductions': inductions}
+
+
+def probe_iteration(ctx, plan, target, jump):
+    """
+    runs one iteration of the loop, returns (the measured difference, whether the loop goes on)
+    """
+    pointer = target
+    measured = None
+    while True:
+        if pointer == plan['probe']:
+            if plan['kind'] == 'direct':
+                measured, _, _ = read_parameters(ctx, pointer, True, True)
+            else:
+                p1, p2, _, _ = read_parameters(ctx, pointer, True, True, False)
+                measured = p1 - p2
+        if pointer == jump:
+            return measured, run_instruction(ctx, pointer) == target
+        pointer = run_instruction(ctx, pointer)
+
+
+def exit_iteration(plan, opcode, d1, slope):
+    """
+    first iteration j >= 1 at which the loop exits, the difference at iteration j being d1 + slope * (j - 1).
+    None if it never exits.
+    """
+    # when does the jump stop being taken, in terms of the difference
+    go_on_if_flag = opcode is OPCode.JIT
+    if plan['kind'] == 'lt':
+        exits_when = 'd>=0' if go_on_if_flag else 'd<0'
+    elif plan['kind'] == 'eq':
+        exits_when = 'd!=0' if go_on_if_flag else 'd==0'
+    else:
+        exits_when = 'd==0' if go_on_if_flag else 'd!=0'
+
+    if slope == 0:
+        return None
+    if exits_when == 'd>=0':
+        return 1 - (d1 // slope) if slope > 0 else None
+    if exits_when == 'd<0':
+        return 2 + d1 // -slope if slope < 0 else None
+    if exits_when == 'd==0':
+        return 1 + -d1 // slope if -d1 % slope == 0 and -d1 // slope >= 0 else None
+    # d != 0: having gone on twice, d was 0 twice, so the slope is 0
+    return None
+
+
+def accelerate_loop(ctx, jump, target):
+    """
+    called when the jump at `jump` just went back to `target`, returns the pointer to go on with
+    """
+    memory = ctx['memory']
+    if memory.dirty:
+        # some code of known loops was modified: their plans, even negative ones, are computed again
+        for key in [key for key in ctx['loops'] if any(key[0] <= address < key[1] + 3 for address in memory.dirty)]:
+            del ctx['loops'][key]
+        memory.dirty.clear()
+
+    key = target, jump, ctx['rel_base']
+    if key not in ctx['loops']:
+        memory.watched.update(range(target, jump + 3))
+        ctx['loops'][key] = loop_plan(ctx, target, jump)
+    plan = ctx['loops'][key]
+    if plan is None:
+        return target
+
+    opcode = parse_opcode(ctx, jump)
+    d1, going_on = probe_iteration(ctx, plan, target, jump)
+    if not going_on:
+        return jump + 3
+    before = {address: ctx['memory'][address] for _, address in plan['inductions']}
+    d2, going_on = probe_iteration(ctx, plan, target, jump)
+    if not going_on:
+        return jump + 3
+
+    exit_at = exit_iteration(plan, opcode, d1, d2 - d1)
+    if exit_at is None or exit_at < 3:
+        return target
+
+    # iterations 1 and 2 are done: skip iterations 3 to exit_at - 1
+    skipped = exit_at - 3
+    for address, value in before.items():
+        step = ctx['memory'][address] - value
+        ctx['memory'][address] += step * skipped
+    return target
+
+
+def run(program, stdin, stdout, accelerate=True):
     ctx = {
-        'memory': {a: program[a] for a in range(len(program))},
+        'memory': Overlay(program),
         'stdin': stdin,
         'stdout': stdout,
         'rel_base': 0,
+        'loops': {},
     }
     pointer = 0
 
     try:
         while True:
+            previous = pointer
             pointer = run_instruction(ctx, pointer)
+            if accelerate and pointer < previous:
+                pointer = accelerate_loop(ctx, previous, pointer)
     except HaltError:
         # no-op
         pass
@@ -206,13 +377,13 @@ def test():
     return p.exitcode
 
 
-def boost():
-    program = load_program()
+def boost(path, accelerate=True):
+    program = publish(load_program(path))
 
     pin, stdout = Pipe(False)
     stdin, pout = Pipe(False)
 
-    p = Process(target=run, args=(program, stdin, stdout))
+    p = Process(target=run, args=(program, stdin, stdout, accelerate))
     p.start()
 
     pout.send(2)
@@ -229,8 +400,12 @@ def boost():
     return p.exitcode
 
 
-def main():
-    click.secho(f'Exit code: {boost()}', fg='magenta')
+@click.command()
+@click.option('--input', 'path', default=default_input(__file__), type=click.Path(exists=True, allow_dash=True),
+              help='BOOST program, - for stdin')
+@click.option('--accelerate/--no-accelerate', default=True, help='run counting loops in closed form')
+def main(path, accelerate):
+    click.secho(f'Exit code: {boost(path, accelerate)}', fg='magenta')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,42 @@
+from analyzer import CODE, DATA, SELF_MODIFIED, analyze
+
+
+def test_pure_code_and_data():
+    # jump over a data cell, to an HALT
+    analysis = analyze([1101, 1, 2, 9, 1105, 1, 8, 0, 99, 0])
+    assert analysis['complete']
+    assert analysis['cells'] == [CODE] * 7 + [DATA, CODE, DATA]
+
+
+def test_position_write_into_code():
+    # the ADD writes 99 into the opcode of the instruction right after it
+    analysis = analyze([1101, 0, 99, 4, 1105, 1, 0])
+    assert not analysis['complete']
+    assert analysis['cells'][4] == SELF_MODIFIED
+
+
+def test_write_after_execute():
+    # both ADDs run once before their own first cell is written: what follows them is still code
+    analysis = analyze([1, 0, 0, 0, 1, 0, 0, 5, 99])
+    assert analysis['cells'] == [SELF_MODIFIED] + [CODE] * 4 + [SELF_MODIFIED] + [CODE] * 3
+    assert analysis['cfg'] == {0: {'end': 8, 'successors': []}}
+    assert analysis['unresolved_jumps'] == [0]
+    assert not analysis['unbounded_writes']
+    assert not analysis['complete']
+
+
+def test_relative_write_into_code():
+    # with rel_base at 8, the ADD writes 99 into its own parameter cell 4
+    analysis = analyze([109, 8, 21101, 0, 99, -4, 1105, 1, 0])
+    assert analysis['dynamic_writes'] == [2]
+    assert analysis['unbounded_writes']
+    assert not analysis['complete']
+    # no static write reaches the code, it is only flagged as possibly overwritten
+    assert analysis['cells'][:9] == [CODE] * 9
+
+
+def test_relative_write_untrusts_position_targets():
+    # the jump target is read from cell 9, which a relative-mode write may reach
+    analysis = analyze([109, 1, 21101, 0, 0, 0, 105, 1, 9, 10, 99])
+    assert 6 in analysis['unresolved_jumps']
+    assert not analysis['complete']
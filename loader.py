@@ -0,0 +1,183 @@
+"""
+common input loading layer of the solvers.
+
+an input is either an explicit path or `-` for stdin. files are memory-mapped rather than read, and parsed into the
+structure the solver works on: an int array, an edge list, a digit buffer or lines of moves. the parsed form is cached
+on disk, keyed by the sha256 of the content, so a repeated run on the same input skips parsing.
+
+the cache lives in $AOC_CACHE_DIR, ~/.cache/aoc2019 by default. setting AOC_CACHE_DIR to an empty string disables it,
+as does `cache=False` for a single load: bulk paths reading each input once don't go through it. its pickles are bounded
+to CACHE_MAX_BYTES, the least recently used ones being evicted, and inputs too large for that budget are never cached.
+"""
+
+from array import array
+from contextlib import contextmanager
+import hashlib
+import mmap
+import os
+import pickle
+import re
+import sys
+import tempfile
+
+
+INT = re.compile(rb'-?\d+')
+EDGE = re.compile(rb'(\w+)\)(\w+)')
+TOKEN = re.compile(rb'\S+')
+
+# the highest protocol every supported python reads, so one cache can be shared between them
+CACHE_PROTOCOL = 4
+
+# total size of the parse cache pickles; an input bigger than a quarter of it isn't worth evicting the others
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# bytes of the parse cache, only known after its first scan
+disk_bytes = None
+
+
+def default_input(solver_file):
+    """
+    the `input` file next to a solver, whatever the current working directory
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(solver_file)), 'input')
+
+
+def cache_dir():
+    return os.environ.get('AOC_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'aoc2019'))
+
+
+@contextmanager
+def open_input(path, mode='rb'):
+    """
+    opens an input, `-` being stdin
+    """
+    if path == '-':
+        yield sys.stdin.buffer if 'b' in mode else sys.stdin
+        return
+    with open(path, mode) as _f:
+        yield _f
+
+
+@contextmanager
+def map_input(path):
+    """
+    the whole content of an input as a bytes-like buffer: memory-mapped for files, read for stdin
+    """
+    with open_input(path) as _f:
+        if path == '-':
+            yield _f.read()
+            return
+        if os.fstat(_f.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(_f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield buffer
+
+
+def parse_int_array(buffer):
+    """
+    the ints of the buffer as a compact int64 array, or as a list of python ints when one of them doesn't fit in 64 bits
+    """
+    try:
+        return array('q', (int(m.group()) for m in INT.finditer(buffer)))
+    except OverflowError:
+        return [int(m.group()) for m in INT.finditer(buffer)]
+
+
+def parse_edge_list(buffer):
+    return [(a.decode(), b.decode()) for a, b in EDGE.findall(buffer)]
+
+
+def parse_digit_buffer(buffer):
+    token = TOKEN.search(buffer)
+    return token.group().decode() if token else ''
+
+
+def parse_moves(buffer):
+    return [token.group().decode().split(',') for token in TOKEN.finditer(buffer)]
+
+
+PARSERS = {
+    'int_array': parse_int_array,
+    'edge_list': parse_edge_list,
+    'digit_buffer': parse_digit_buffer,
+    'moves': parse_moves,
+}
+
+
+def load(path, parser, cache=True):
+    """
+    loads an input with one of the PARSERS, going through the on-disk cache unless `cache` is False
+    """
+    global disk_bytes
+
+    parse = PARSERS[parser]
+    with map_input(path) as buffer:
+        directory = cache_dir() if cache else ''
+        if not directory or len(buffer) > CACHE_MAX_BYTES // 4:
+            return parse(buffer)
+
+        digest = hashlib.sha256(buffer).hexdigest()
+        cached = os.path.join(directory, f'{parser}-{digest}.pickle')
+        try:
+            with open(cached, 'rb') as _f:
+                parsed = pickle.load(_f)
+            # mtime is the cache recency
+            os.utime(cached)
+            return parsed
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            # ValueError: pickled by a python whose protocol is unknown to this one
+            pass
+
+        parsed = parse(buffer)
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'wb') as _f:
+            pickle.dump(parsed, _f, protocol=CACHE_PROTOCOL)
+        os.replace(tmp, cached)
+        if disk_bytes is not None:
+            disk_bytes += os.path.getsize(cached)
+        if disk_bytes is None or disk_bytes > CACHE_MAX_BYTES:
+            disk_bytes = evict(directory, CACHE_MAX_BYTES)
+    except OSError:
+        # a cache we can't write to only costs the parsing next time
+        pass
+    return parsed
+
+
+def evict(directory, max_bytes):
+    """
+    removes the least recently used pickles of the parse cache, down to 3/4 of `max_bytes` so a full cache isn't
+    scanned again on every store, and returns the bytes left
+    """
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith('.pickle') and entry.is_file():
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes * 3 // 4:
+            break
+        os.remove(path)
+        total -= size
+    return total
+
+
+def load_int_array(path, cache=True):
+    return load(path, 'int_array', cache)
+
+
+def load_edge_list(path, cache=True):
+    return load(path, 'edge_list', cache)
+
+
+def load_digit_buffer(path, cache=True):
+    return load(path, 'digit_buffer', cache)
+
+
+def load_moves(path, cache=True):
+    return load(path, 'moves', cache)
@@ -0,0 +1,65 @@
+"""
+one Intcode program image shared by every worker process.
+
+the parent publishes the program once in a read-only shared memory segment; workers attach to it as a Process argument
+(the segment is inherited or passed by handle, never pickled cell by cell) and only keep a private overlay of the cells
+they write to. spawning a worker no longer costs a copy of the program, and its resident memory only grows with what it
+modifies.
+
+the segment holds signed 64 bits cells: a program with a literal beyond that range is published as a plain list, copied
+to every worker but with its values kept whole.
+"""
+
+from multiprocessing.sharedctypes import RawArray
+
+
+# range of a cell of the shared segment, which silently wraps anything beyond it
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def publish(program):
+    """
+    copies the program once into a shared memory segment of signed 64 bits cells, or into a list if they can't hold it
+    """
+    if all(INT64_MIN <= value <= INT64_MAX for value in program):
+        return RawArray('q', program)
+    return list(program)
+
+
+class Overlay:
+    """
+    copy-on-write view of a program image: reads fall through to the image unless the cell has been written, and
+    memory beyond the image reads as 0.
+    writes to the `watched` cells are recorded in `dirty`, for whoever needs to know when some code gets modified.
+    """
+
+    def __init__(self, image):
+        self.image = image
+        self.size = len(image)
+        self.cells = {}
+        self.watched = set()
+        self.dirty = set()
+
+    def __getitem__(self, address):
+        value = self.cells.get(address)
+        if value is not None:
+            return value
+        if address < 0:
+            raise IndexError(f'negative address {address}')
+        return self.image[address] if address < self.size else 0
+
+    def __setitem__(self, address, value):
+        if address < 0:
+            raise IndexError(f'negative address {address}')
+        if address in self.watched:
+            self.dirty.add(address)
+        self.cells[address] = value
+
+    def get(self, address, default=0):
+        try:
+            return self[address]
+        except IndexError:
+            return default
+
+    def __len__(self):
+        return max(self.size, max(self.cells, default=-1) + 1)
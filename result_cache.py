@@ -0,0 +1,128 @@
+"""
+content-addressed cache of deterministic Intcode runs.
+
+a run is a pure function of its program, the memory patches applied before it starts and its input sequence, so its
+result is cached under the sha256 of those three. there are two tiers: an in-memory LRU, and pickles on disk under
+$AOC_CACHE_DIR/results, the least recently used ones being evicted past a total size. an empty AOC_CACHE_DIR keeps the
+in-memory tier only.
+
+caching is opt-in: an entry point only goes through a ResultCache when given one.
+"""
+
+from collections import OrderedDict
+import hashlib
+import os
+import pickle
+import tempfile
+
+from loader import CACHE_PROTOCOL, cache_dir
+
+
+class ResultCache:
+
+    def __init__(self, namespace, program, maxsize=1024, max_bytes=64 * 1024 * 1024):
+        """
+        `namespace` tells apart entry points running the same program differently, e.g. with a different I/O wiring
+        """
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.memory = OrderedDict()
+
+        # the program is only hashed once, runs are then keyed by this digest
+        digest = hashlib.sha256(namespace.encode())
+        digest.update(repr(list(program)).encode())
+        self.program_digest = digest.digest()
+
+        directory = cache_dir()
+        self.directory = os.path.join(directory, 'results', namespace) if directory else None
+        # bytes of the disk tier, only known after its first scan
+        self.disk_bytes = None
+
+    def key(self, patches, inputs):
+        digest = hashlib.sha256(self.program_digest)
+        digest.update(repr(sorted(dict(patches).items())).encode())
+        digest.update(repr(list(inputs)).encode())
+        return digest.hexdigest()
+
+    def lookup(self, patches, inputs, compute):
+        """
+        returns the result of the run, calling `compute()` only if neither tier knows it
+        """
+        found, result = self.get(patches, inputs)
+        if not found:
+            result = compute()
+            self.put(patches, inputs, result)
+        return result
+
+    def get(self, patches, inputs):
+        """
+        returns (whether the run is known, its result)
+        """
+        key = self.key(patches, inputs)
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return True, self.memory[key]
+
+        found, result = self.load(key)
+        if found:
+            self.remember(key, result)
+        return found, result
+
+    def put(self, patches, inputs, result):
+        key = self.key(patches, inputs)
+        self.store(key, result)
+        self.remember(key, result)
+
+    def remember(self, key, result):
+        self.memory[key] = result
+        if len(self.memory) > self.maxsize:
+            self.memory.popitem(last=False)
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.pickle')
+
+    def load(self, key):
+        if self.directory is None:
+            return False, None
+        try:
+            with open(self.path(key), 'rb') as _f:
+                result = pickle.load(_f)
+            # mtime is the disk tier recency
+            os.utime(self.path(key))
+            return True, result
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            # ValueError: pickled by a python whose protocol is unknown to this one
+            return False, None
+
+    def store(self, key, result):
+        if self.directory is None:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory)
+            with os.fdopen(fd, 'wb') as _f:
+                pickle.dump(result, _f, protocol=CACHE_PROTOCOL)
+            os.replace(tmp, self.path(key))
+            if self.disk_bytes is not None:
+                self.disk_bytes += os.path.getsize(self.path(key))
+            if self.disk_bytes is None or self.disk_bytes > self.max_bytes:
+                self.evict()
+        except OSError:
+            # a cache we can't write to only costs the run next time
+            pass
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pickle'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        # going down to 3/4 of the budget, so a full cache isn't scanned again on every store
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes * 3 // 4:
+                break
+            os.remove(path)
+            total -= size
+        self.disk_bytes = total
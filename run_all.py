@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+"""
+runs every dayN/solver.py concurrently and reports, per solver, its wall time, CPU time and peak RSS as JSON, both
+counting the worker processes the solver may start.
+
+each solver runs in its own directory, on a process pool sized to the machine: the whole run takes about the time of
+the slowest solver.
+"""
+
+from multiprocessing import Pool, cpu_count
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# what the interactive solvers are expecting on stdin
+STDIN = {
+    'day5': '5\n',
+}
+
+# lines of each solver output kept in the report
+TAIL = 20
+
+
+def discover(root=ROOT):
+    """
+    yields (day, path of its solver), in days order
+    """
+    solvers = glob.glob(os.path.join(root, 'day*', 'solver.py'))
+    for path in sorted(solvers, key=lambda p: int(os.path.basename(os.path.dirname(p))[3:])):
+        yield os.path.basename(os.path.dirname(path)), path
+
+
+def children_from_stat():
+    """
+    parent pid => [child pid, ...] of every running process, from the ppid field of /proc/<pid>/stat
+    """
+    children = {}
+    for stat in glob.glob('/proc/[0-9]*/stat'):
+        try:
+            with open(stat, 'r') as _f:
+                # the command name, in parentheses, may hold spaces
+                fields = _f.read().rsplit(')', 1)[1].split()
+            children.setdefault(int(fields[1]), []).append(int(os.path.basename(os.path.dirname(stat))))
+        except (OSError, ValueError, IndexError):
+            # the process is already gone
+            pass
+    return children
+
+
+def process_tree(pid):
+    """
+    yields the pid of a running process and of all its descendants, from /proc/<pid>/task/<tid>/children, or from the
+    parent pids of /proc/<pid>/stat when the kernel doesn't provide those
+    """
+    from_stat = None
+    todo = [pid]
+    while todo:
+        pid = todo.pop()
+        yield pid
+        tasks = glob.glob(f'/proc/{pid}/task/*/children')
+        if not tasks and os.path.exists(f'/proc/{pid}/task'):
+            from_stat = children_from_stat() if from_stat is None else from_stat
+            todo.extend(from_stat.get(pid, []))
+        for children in tasks:
+            try:
+                with open(children, 'r') as _f:
+                    todo.extend(int(child) for child in _f.read().split())
+            except (OSError, ValueError):
+                # the thread or the process is already gone
+                pass
+
+
+def peak_rss_kb(pid):
+    """
+    VmHWM of a running process, None if /proc doesn't tell
+    """
+    try:
+        with open(f'/proc/{pid}/status', 'r') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def tail(_f, size=64 * 1024):
+    _f.seek(0, os.SEEK_END)
+    _f.seek(max(0, _f.tell() - size))
+    return _f.read().decode(errors='replace').splitlines()[-TAIL:]
+
+
+def run_solver(job):
+    """
+    runs a solver and reaps it with wait4, to get the CPU time used by this very child and its waited-for children.
+    its peak RSS is polled from /proc while it runs (ru_maxrss would include the memory of the pool worker it was forked
+    from): it is the sum of the VmHWM of every process of its tree seen while polling, so it includes the solver's own
+    worker pools. these peaks may not have been simultaneous, this is an upper bound of the tree peak; it is None if
+    /proc never told.
+    """
+    day, path, timeout, output_dir = job
+    with tempfile.TemporaryFile() as stdin, tempfile.TemporaryFile() as stdout, tempfile.TemporaryFile() as stderr:
+        stdin.write(STDIN.get(day, '').encode())
+        stdin.seek(0)
+
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, path], cwd=os.path.dirname(path), stdin=stdin, stdout=stdout,
+                                   stderr=stderr)
+        timed_out = False
+        # pid => VmHWM, kept for the processes of the tree which already exited
+        peaks = {}
+        while True:
+            for tree_pid in process_tree(process.pid):
+                peak = peak_rss_kb(tree_pid)
+                if peak is not None:
+                    peaks[tree_pid] = max(peak, peaks.get(tree_pid, 0))
+            pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+            if pid:
+                break
+            if timeout is not None and time.perf_counter() - start > timeout:
+                process.kill()
+                timed_out = True
+                pid, status, rusage = os.wait4(process.pid, 0)
+                break
+            time.sleep(0.01)
+        wall_time = time.perf_counter() - start
+        # the child is reaped: tell Popen not to wait for it
+        process.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+
+        if output_dir is not None:
+            stdout.seek(0)
+            with open(os.path.join(output_dir, f'{day}.out'), 'wb') as _f:
+                shutil.copyfileobj(stdout, _f)
+        output = tail(stdout)
+        errors = tail(stderr)
+
+    return {
+        'day': day,
+        'solver': os.path.relpath(path, ROOT),
+        'returncode': process.returncode,
+        'timed_out': timed_out,
+        'wall_time': round(wall_time, 3),
+        'cpu_time': round(rusage.ru_utime + rusage.ru_stime, 3),
+        'peak_rss_kb': sum(peaks.values()) if peaks else None,
+        'stdout_tail': output,
+        'stderr_tail': errors,
+    }
+
+
+@click.command()
+@click.option('--jobs', type=int, default=None, help='number of solvers run at once (default: one per CPU)')
+@click.option('--timeout', type=float, default=None, help='seconds after which a solver is killed')
+@click.option('--output-dir', type=click.Path(file_okay=False), default=None, help='where to keep full outputs')
+@click.option('--day', 'days', multiple=True, help='only run these days, e.g. --day day3 --day day7')
+def main(jobs, timeout, output_dir, days):
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+    solvers = [(day, path) for day, path in discover() if not days or day in days]
+
+    start = time.perf_counter()
+    with Pool(processes=jobs or cpu_count()) as pool:
+        results = pool.map(run_solver, [(day, path, timeout, output_dir) for day, path in solvers], chunksize=1)
+
+    report = {
+        'wall_time': round(time.perf_counter() - start, 3),
+        'solvers': results,
+    }
+    click.echo(json.dumps(report, indent=2))
+    sys.exit(1 if any(result['returncode'] for result in results) else 0)
+
+
+if __name__ == '__main__':
+    main()